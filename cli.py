@@ -5,7 +5,6 @@ Finds the nearest library to a given postcode
 # Standard Library Imports
 import datetime
 import re
-import sqlite3
 
 # Standard From Imports
 from typing import Union
@@ -68,17 +67,15 @@ def main() -> None:
         None
     """
 
-    with sqlite3.connect(constants.DATABASE_FILE) as conn:
-        database_handling.create_database(conn)
-        
+    database_handling.initialise_database()
+
+    with database_handling.get_connection() as conn:
         oldest_date: datetime.date = database_handling.get_oldest_date(conn)
 
         if utilities.check_date_older_than_days(oldest_date, constants.DAYS_TO_REFRESH_DB):
-            database_handling.clear_records(conn)
-        
             libraries: list[Library] = third_party_integrations.execute_library_sparql_query()
 
-            database_handling.add_libraries_to_database(conn, libraries)
+            database_handling.replace_libraries_if_older_than(conn, libraries, constants.DAYS_TO_REFRESH_DB)
         
         postcode: str = get_postcode_from_user()
 
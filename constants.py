@@ -9,4 +9,19 @@ SIX_MONTHS_IN_DAYS: int = 180
 DAYS_TO_REFRESH_DB: int = SIX_MONTHS_IN_DAYS
 DATABASE_FILE: str = "library.db"
 FLASK_PORT: int = 8000
-LOG_FILE: str = "log.txt"
\ No newline at end of file
+LOG_FILE: str = "log.txt"
+DUPLICATE_LIBRARY_DISTANCE_KM: float = 0.1
+SQL_DIRECTORY: str = "sql"
+SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+SQLITE_CACHED_STATEMENTS: int = 32
+PROFILE_ENABLED_ENV: str = "LIBRARY_PROFILE"
+PROFILE_SAMPLE_RATE_ENV: str = "LIBRARY_PROFILE_SAMPLE_RATE"
+PROFILE_TOKEN_ENV: str = "LIBRARY_PROFILE_TOKEN"
+PROFILE_HEADER: str = "X-Profile-Token"
+PROFILE_DIRECTORY: str = "profiles"
+PROFILE_MAX_FILES: int = 50
+PROFILE_MAX_STACK_DEPTH: int = 64
+COLUMNAR_FORMAT: str = "columns"
+COMPRESSION_MIN_SIZE: int = 1024
+GZIP_COMPRESS_LEVEL: int = 6
+BROTLI_QUALITY: int = 5
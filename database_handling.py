@@ -2,16 +2,132 @@
 import datetime
 import os
 import sqlite3
+import threading
+
+# Standard From Imports
+from contextlib import contextmanager
+from typing import Iterator
 
 # Custom Imports
+import constants
 import utilities
 
 # Custom From Imports
 from models import Library, Point
 
-def create_database(conn: sqlite3.Connection) -> None:
+# Each entry is the name of a query in the sql directory, applied in order and tracked with PRAGMA user_version
+MIGRATIONS: list[str] = [
+    "createLibraryTable"
+]
+
+_queries: dict[str, str] = {}
+_connections: dict[bool, sqlite3.Connection] = {}
+_connection_locks: dict[bool, threading.Lock] = {
+    False: threading.Lock(),
+    True: threading.Lock()
+}
+_connection_pid: int = os.getpid()
+
+def load_queries() -> dict[str, str]:
+    """
+    Loads every query in the sql directory into memory, if they haven't been loaded already
+
+    Parameters:
+        None
+    Returns:
+        dict[str, str] - the queries, keyed by file name without the extension
+    """
+
+    if not _queries:
+        for filename in sorted(os.listdir(constants.SQL_DIRECTORY)):
+            name, extension = os.path.splitext(filename)
+
+            if extension == ".sql":
+                _queries[name] = utilities.get_query_from_file(os.path.join(constants.SQL_DIRECTORY, filename))
+
+    return _queries
+
+def get_query(name: str) -> str:
+    """
+    Gets a query from the in memory query cache
+
+    Parameters:
+        name (str): the name of the query file, without the extension
+    Returns:
+        str - the query
+    """
+
+    return load_queries()[name]
+
+def open_connection(read_only: bool = False) -> sqlite3.Connection:
     """
-    Creates the database if it doesn't exist, and creates the libraries table if it doesn't exist
+    Opens a connection to the database, configured for WAL and memory mapped reads
+
+    Parameters:
+        read_only (bool): whether to open the database in read only mode
+    Returns:
+        sqlite3.Connection - the connection to the database
+    """
+
+    if read_only:
+        conn: sqlite3.Connection = sqlite3.connect(
+            f"file:{constants.DATABASE_FILE}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=constants.SQLITE_CACHED_STATEMENTS
+        )
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(
+            constants.DATABASE_FILE,
+            check_same_thread=False,
+            cached_statements=constants.SQLITE_CACHED_STATEMENTS
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+
+    conn.execute(f"PRAGMA mmap_size = {constants.SQLITE_MMAP_SIZE}")
+
+    return conn
+
+@contextmanager
+def get_connection(read_only: bool = False) -> Iterator[sqlite3.Connection]:
+    """
+    Gets the long lived connection for this worker, holding it until the block exits
+
+    Connections are opened lazily and reopened after a fork, so each worker process has its own.
+
+    Parameters:
+        read_only (bool): whether to use the read only connection
+    Returns:
+        Iterator[sqlite3.Connection] - the connection to the database
+    """
+
+    global _connection_pid
+
+    if _connection_pid != os.getpid():
+        # The connections were inherited from the parent process, so they must not be used
+        _connections.clear()
+        _connection_locks[False] = threading.Lock()
+        _connection_locks[True] = threading.Lock()
+        _connection_pid = os.getpid()
+
+    with _connection_locks[read_only]:
+        if read_only not in _connections:
+            _connections[read_only] = open_connection(read_only)
+
+        conn: sqlite3.Connection = _connections[read_only]
+
+        try:
+            yield conn
+        except BaseException:
+            # The connection outlives this block, so an open transaction would keep the database locked
+            conn.rollback()
+            raise
+
+def migrate_database(conn: sqlite3.Connection) -> None:
+    """
+    Applies any migrations the database hasn't had yet
 
     Parameters:
         conn (sqlite3.Connection): the connection to the database
@@ -19,13 +135,34 @@ def create_database(conn: sqlite3.Connection) -> None:
         None
     """
 
-    query_file: str = os.path.join("sql", "createLibraryTable.sql")
-    query: str = utilities.get_query_from_file(query_file)
+    version: int = conn.execute("PRAGMA user_version").fetchone()[0]
 
-    conn.execute(query)
+    for index, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute(get_query(migration))
+        conn.execute(f"PRAGMA user_version = {index}")
 
     conn.commit()
 
+def initialise_database() -> None:
+    """
+    Loads the queries and brings the database schema up to date. Should be called once at startup
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    load_queries()
+
+    # Use a short lived connection, so nothing is shared with processes forked after startup
+    conn: sqlite3.Connection = open_connection()
+
+    try:
+        migrate_database(conn)
+    finally:
+        conn.close()
+
 def get_oldest_date(conn: sqlite3.Connection) -> datetime.date:
     """
     Gets the oldest date in the database
@@ -38,8 +175,7 @@ def get_oldest_date(conn: sqlite3.Connection) -> datetime.date:
     
     cursor: sqlite3.Cursor = conn.cursor()
 
-    query_file: str = os.path.join("sql", "getOldestDate.sql")
-    query: str = utilities.get_query_from_file(query_file)
+    query: str = get_query("getOldestDate")
 
     cursor.execute(query)
     oldest_date = cursor.fetchone()[0]
@@ -51,7 +187,7 @@ def get_oldest_date(conn: sqlite3.Connection) -> datetime.date:
 
 def clear_records(conn: sqlite3.Connection) -> None:
     """
-    Clears the records in the database
+    Clears the records in the database. The caller is responsible for committing
 
     Parameters:
         conn (sqlite3.Connection): the connection to the database
@@ -61,16 +197,13 @@ def clear_records(conn: sqlite3.Connection) -> None:
 
     cursor: sqlite3.Cursor = conn.cursor()
 
-    query_file: str = os.path.join("sql", "clearLibraries.sql")
-    query: str = utilities.get_query_from_file(query_file)
+    query: str = get_query("clearLibraries")
 
     cursor.execute(query)
 
-    conn.commit()
-
 def add_libraries_to_database(conn: sqlite3.Connection, libraries: list[Library]) -> None:
     """
-    Adds the libraries to the database
+    Adds the libraries to the database. The caller is responsible for committing
 
     Parameters:
         conn (sqlite3.Connection): the connection to the database
@@ -81,14 +214,38 @@ def add_libraries_to_database(conn: sqlite3.Connection, libraries: list[Library]
 
     cursor: sqlite3.Cursor = conn.cursor()
 
-    query_file: str = os.path.join("sql", "addLibrary.sql")
-    query: str = utilities.get_query_from_file(query_file)
+    query: str = get_query("addLibrary")
+
+    cursor.executemany(query, [(library.name, library.point.latitude, library.point.longitude) for library in libraries])
+
+def replace_libraries_if_older_than(conn: sqlite3.Connection, libraries: list[Library], days: int) -> bool:
+    """
+    Replaces the libraries in the database if they are older than a given number of days.
+
+    The check, delete and insert run in one immediate transaction, so other workers can't
+    refresh at the same time and readers never see an empty table.
 
-    for library in libraries:
-        cursor.execute(query, (library.name, library.point.latitude, library.point.longitude))
+    Parameters:
+        conn (sqlite3.Connection): the connection to the database
+        libraries (list[Library]): the libraries to replace the existing ones with
+        days (int): the number of days after which the libraries are replaced
+    Returns:
+        bool - True if the libraries were replaced, False if another refresh got there first
+    """
+
+    conn.execute("BEGIN IMMEDIATE")
+
+    if not utilities.check_date_older_than_days(get_oldest_date(conn), days):
+        conn.rollback()
+        return False
+
+    clear_records(conn)
+    add_libraries_to_database(conn, libraries)
 
     conn.commit()
 
+    return True
+
 def get_libraries_from_database(conn: sqlite3.Connection) -> list[Library]:
     """
     Gets the libraries from the database
@@ -101,8 +258,7 @@ def get_libraries_from_database(conn: sqlite3.Connection) -> list[Library]:
 
     cursor: sqlite3.Cursor = conn.cursor()
 
-    query_file: str = os.path.join("sql", "getLibraries.sql")
-    query: str = utilities.get_query_from_file(query_file)
+    query: str = get_query("getLibraries")
 
     cursor.execute(query)
 
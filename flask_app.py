@@ -1,6 +1,5 @@
 # Standard Library Imports
 import datetime
-import sqlite3
 
 # Third Party From Imports
 from flask import Flask
@@ -11,6 +10,8 @@ from flask_cors import CORS, cross_origin
 import constants
 import database_handling
 import logger
+import profiling
+import serialisation
 import third_party_integrations
 import utilities
 
@@ -23,15 +24,62 @@ cors = CORS(app)
 
 app.config['CORS_HEADERS'] = 'Content-Type'
 
+# Load queries and apply migrations once, rather than on every request
+database_handling.initialise_database()
+
 # crreate endpoint / for hello world
 @app.route('/')
 @cross_origin()
 def hello_world():
     return 'Hello, World!'
 
+def refresh_database_if_needed():
+    """
+    Refreshes the libraries from wikidata if the database is older than the refresh period
+    :return: error response if the refresh failed, otherwise None
+    """
+
+    logger.log(__file__, "Checking if database needs to be refreshed")
+
+    with profiling.phase("refresh_check"), database_handling.get_connection(read_only=True) as conn:
+        oldest_date: datetime.date = database_handling.get_oldest_date(conn)
+
+    if not utilities.check_date_older_than_days(oldest_date, constants.DAYS_TO_REFRESH_DB):
+        return None
+
+    with database_handling.get_connection() as conn:
+        # Another request in this worker may have refreshed the database while we waited for the writer,
+        # other workers are handled by the transaction in replace_libraries_if_older_than
+        oldest_date = database_handling.get_oldest_date(conn)
+
+        if not utilities.check_date_older_than_days(oldest_date, constants.DAYS_TO_REFRESH_DB):
+            return None
+
+        logger.log(__file__, "Database needs to be refreshed")
+        logger.log(__file__, "Getting libraries from wikidata")
+
+        try:
+            with profiling.phase("wikidata_query"):
+                libraries: list[Library] = third_party_integrations.execute_library_sparql_query()
+        except Exception as e:
+            logger.log(__file__, f"Error getting libraries from wikidata: {e}")
+            return {
+                "success": False,
+                "error": "Error getting libraries from wikidata"
+            }, 500
+
+        with profiling.phase("database_write"):
+            logger.log(__file__, "Replacing libraries in database")
+
+            if not database_handling.replace_libraries_if_older_than(conn, libraries, constants.DAYS_TO_REFRESH_DB):
+                logger.log(__file__, "Database was refreshed by another worker")
+
+    return None
+
 # Create endpoint for getting libraries
 @app.route('/postcode/<string:postcode>/count/<int:count>', methods=['GET'])
 @cross_origin()
+@profiling.profiled
 def get_libraries(postcode: str, count: int):
     """
     Endpoint for getting libraries from database
@@ -42,56 +90,38 @@ def get_libraries(postcode: str, count: int):
 
     logger.log(__file__, f"Getting libraries for postcode {postcode} and count {count}")
 
-    with sqlite3.connect(constants.DATABASE_FILE) as conn:
-        logger.log(__file__, "Connected to database")
-        database_handling.create_database(conn)
-
-        logger.log(__file__, "Checking if database needs to be refreshed")
+    error_response = refresh_database_if_needed()
 
-        oldest_date: datetime.date = database_handling.get_oldest_date(conn)
-
-        if utilities.check_date_older_than_days(oldest_date, constants.DAYS_TO_REFRESH_DB):
-            logger.log(__file__, "Database needs to be refreshed")
-            logger.log(__file__, "Clearing records from database")
-            database_handling.clear_records(conn)
-        
-            logger.log(__file__, "Getting libraries from wikidata")
-
-            try:
-                libraries: list[Library] = third_party_integrations.execute_library_sparql_query()
-            except Exception as e:
-                logger.log(__file__, f"Error getting libraries from wikidata: {e}")
-                return {
-                    "success": False,
-                    "error": "Error getting libraries from wikidata"
-                }, 500
-
-            logger.log(__file__, "Adding libraries to database")
-            database_handling.add_libraries_to_database(conn, libraries)
+    if error_response:
+        return error_response
 
-        logger.log(__file__, "Getting latitude and longitude from postcode")
+    logger.log(__file__, "Getting latitude and longitude from postcode")
+    with profiling.phase("postcode_lookup"):
         if not third_party_integrations.check_postcode_valid(postcode):
             return {
                 "success": False,
                 "error": "Invalid postcode"
             }, 400
-        
+
         point: Point = third_party_integrations.get_latitude_and_longitude_from_postcode(postcode)
 
-        logger.log(__file__, "Getting libraries from database")
+    logger.log(__file__, "Getting libraries from database")
+    with profiling.phase("database_read"), database_handling.get_connection(read_only=True) as conn:
         libraries: list[Library] = database_handling.get_libraries_from_database(conn)
 
+    with profiling.phase("nearest_search"):
         nearest_libraries: list[Library] = utilities.find_nearest_n_libraries(libraries, point, count)
 
-        return {
+    with profiling.phase("serialisation"):
+        return serialisation.make_libraries_response({
             "success": True,
             "postcode": postcode,
-            "count": len(nearest_libraries),
-            "libraries": [library.__dict__ for library in nearest_libraries]
-        }
+            "count": len(nearest_libraries)
+        }, nearest_libraries)
 
 @app.route('/latitude/<string:latitude>/longitude/<string:longitude>/count/<int:count>', methods=['GET'])
 @cross_origin()
+@profiling.profiled
 def get_libraries_by_coordinates(latitude: str, longitude: str, count: int):
     """
     Endpoint for getting libraries from database by latitutde and longitutde
@@ -103,61 +133,41 @@ def get_libraries_by_coordinates(latitude: str, longitude: str, count: int):
 
     logger.log(__file__, f"Getting libraries for latitude {latitude}, longitude {longitude} and count {count}")
 
-    with sqlite3.connect(constants.DATABASE_FILE) as conn:
-        logger.log(__file__, "Connected to database")
-        database_handling.create_database(conn)
+    error_response = refresh_database_if_needed()
 
-        logger.log(__file__, "Checking if database needs to be refreshed")
+    if error_response:
+        return error_response
 
-        oldest_date: datetime.date = database_handling.get_oldest_date(conn)
+    logger.log(__file__, "Getting latitude and longitude from postcode")
 
-        if utilities.check_date_older_than_days(oldest_date, constants.DAYS_TO_REFRESH_DB):
-            logger.log(__file__, "Database needs to be refreshed")
-            logger.log(__file__, "Clearing records from database")
-            database_handling.clear_records(conn)
-        
-            logger.log(__file__, "Getting libraries from wikidata")
-
-            try:
-                libraries: list[Library] = third_party_integrations.execute_library_sparql_query()
-            except Exception as e:
-                logger.log(__file__, f"Error getting libraries from wikidata: {e}")
-                return {
-                    "success": False,
-                    "error": "Error getting libraries from wikidata"
-                }, 500
-
-            logger.log(__file__, "Adding libraries to database")
-            database_handling.add_libraries_to_database(conn, libraries)
-
-        logger.log(__file__, "Getting latitude and longitude from postcode")
-        
-        if not utilities.is_valid_latitude(latitude):
-            return {
-                "success": False,
-                "error": f"Invalid latitude {latitude}"
-            }, 400
+    if not utilities.is_valid_latitude(latitude):
+        return {
+            "success": False,
+            "error": f"Invalid latitude {latitude}"
+        }, 400
 
-        if not utilities.is_valid_longitude(longitude):
-            return {
-                "success": False,
-                "error": f"Invalid longitude {longitude}"
-            }, 400
+    if not utilities.is_valid_longitude(longitude):
+        return {
+            "success": False,
+            "error": f"Invalid longitude {longitude}"
+        }, 400
 
-        logger.log(__file__, "Getting libraries from database")
+    logger.log(__file__, "Getting libraries from database")
+    with profiling.phase("database_read"), database_handling.get_connection(read_only=True) as conn:
         libraries: list[Library] = database_handling.get_libraries_from_database(conn)
 
-        point: Point = Point(float(latitude), float(longitude))
+    point: Point = Point(float(latitude), float(longitude))
 
+    with profiling.phase("nearest_search"):
         nearest_libraries: list[Library] = utilities.find_nearest_n_libraries(libraries, point, count)
 
-        return {
+    with profiling.phase("serialisation"):
+        return serialisation.make_libraries_response({
             "success": True,
             "latitude": point.latitude,
             "longitude": point.longitude,
-            "count": len(nearest_libraries),
-            "libraries": [library.__dict__ for library in nearest_libraries]
-        }
+            "count": len(nearest_libraries)
+        }, nearest_libraries)
 
 if __name__ == '__main__':
     app.run(port = constants.FLASK_PORT)
\ No newline at end of file
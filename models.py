@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class Point:
@@ -37,4 +38,21 @@ class DistancedLibrary(Library):
         distance: float
     """
 
-    distance: float
\ No newline at end of file
+    distance: float
+
+@dataclass
+class LibraryRecord:
+    """
+    Class to represent a raw library row from wikidata, before normalisation
+
+    Attributes:
+        qid: str
+        name: str
+        point: Point | None
+        has_time_qualifier: bool
+    """
+
+    qid: str
+    name: str
+    point: Optional[Point]
+    has_time_qualifier: bool
@@ -0,0 +1,104 @@
+# Standard Library Imports
+import re
+
+# Custom Imports
+import constants
+import utilities
+
+# Custom From Imports
+from models import Library, LibraryRecord
+
+DROPPED_TIME_QUALIFIED: str = "dropped_time_qualified"
+DROPPED_INVALID_COORDINATES: str = "dropped_invalid_coordinates"
+DROPPED_DUPLICATE_QID: str = "dropped_duplicate_qid"
+MERGED_NEAR_DUPLICATE: str = "merged_near_duplicate"
+
+def has_valid_coordinates(record: LibraryRecord) -> bool:
+    """
+    Checks if a record has usable coordinates
+
+    Parameters:
+        record (LibraryRecord): the record to check
+    Returns:
+        bool - True if the record has a real, in range point, False otherwise
+    """
+
+    if record.point is None:
+        return False
+
+    latitude: float = record.point.latitude
+    longitude: float = record.point.longitude
+
+    if latitude in constants.KNOWN_BAD_LATITUDES:
+        return False
+
+    return utilities.is_valid_latitude(str(latitude)) and utilities.is_valid_longitude(str(longitude))
+
+def get_name_key(name: str) -> str:
+    """
+    Gets a key used to compare library names, ignoring case, punctuation and extra whitespace
+
+    Parameters:
+        name (str): the name of the library
+    Returns:
+        str - the normalised name
+    """
+
+    return " ".join(re.sub(r"[^\w\s]", " ", name.casefold()).split())
+
+def normalise_library_records(records: list[LibraryRecord], distance_threshold_km: float = constants.DUPLICATE_LIBRARY_DISTANCE_KM) -> tuple[list[Library], dict[str, int]]:
+    """
+    Normalises the raw wikidata rows into a clean list of libraries.
+
+    Rows are dropped if they carry a start or end time, or have no valid coordinates.
+    Only the first valid row for each QID is kept, and libraries with the same name
+    within distance_threshold_km of an already kept library are merged into it.
+
+    Parameters:
+        records (list[LibraryRecord]): the raw records, in query order
+        distance_threshold_km (float): the distance under which same named libraries are merged
+    Returns:
+        tuple[list[Library], dict[str, int]] - the libraries, and the number of rows removed by each rule
+    """
+
+    counts: dict[str, int] = {
+        DROPPED_TIME_QUALIFIED: 0,
+        DROPPED_INVALID_COORDINATES: 0,
+        DROPPED_DUPLICATE_QID: 0,
+        MERGED_NEAR_DUPLICATE: 0
+    }
+
+    seen_qids: set[str] = set()
+    kept_by_name: dict[str, list[Library]] = {}
+    libraries: list[Library] = []
+
+    for record in records:
+        if record.has_time_qualifier:
+            counts[DROPPED_TIME_QUALIFIED] += 1
+            continue
+
+        if not has_valid_coordinates(record):
+            counts[DROPPED_INVALID_COORDINATES] += 1
+            continue
+
+        if record.qid in seen_qids:
+            counts[DROPPED_DUPLICATE_QID] += 1
+            continue
+
+        seen_qids.add(record.qid)
+
+        name_key: str = get_name_key(record.name)
+        same_name_libraries: list[Library] = kept_by_name.setdefault(name_key, [])
+
+        if any(
+            utilities.distance_between_points(library.point, record.point) <= distance_threshold_km
+            for library in same_name_libraries
+        ):
+            counts[MERGED_NEAR_DUPLICATE] += 1
+            continue
+
+        library: Library = Library(name=record.name, point=record.point)
+        same_name_libraries.append(library)
+        libraries.append(library)
+
+    return libraries, counts
@@ -0,0 +1,278 @@
+# Standard Library Imports
+import cProfile
+import functools
+import hmac
+import itertools
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+# Standard From Imports
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Iterator, Optional
+
+# Third Party From Imports
+from flask import has_request_context, request
+
+# Custom Imports
+import constants
+import logger
+
+# Read once at import, so the checks on each call are just attribute lookups
+PROFILE_ALL: bool = os.environ.get(constants.PROFILE_ENABLED_ENV, "") == "1"
+PROFILE_SAMPLE_RATE: float = float(os.environ.get(constants.PROFILE_SAMPLE_RATE_ENV, "0") or 0)
+PROFILE_TOKEN: str = os.environ.get(constants.PROFILE_TOKEN_ENV, "")
+
+_local: threading.local = threading.local()
+# cProfile can't reliably run more than one profiler at a time, so concurrent requests go unprofiled
+_profiler_lock: threading.Lock = threading.Lock()
+_profile_counter: Iterator[int] = itertools.count()
+_null_phase: ContextManager[None] = nullcontext()
+
+class ProfileSession:
+    """
+    Class to hold the phase timings of the call being profiled
+
+    Attributes:
+        phases: dict[str, float]
+    """
+
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Times a phase of the call, adding to any earlier time recorded under the same name
+
+        Parameters:
+            name (str): the name of the phase
+        Returns:
+            Iterator[None]
+        """
+
+        start: float = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+def phase(name: str) -> ContextManager[None]:
+    """
+    Times a phase of the current call if it is being profiled, otherwise does nothing
+
+    Parameters:
+        name (str): the name of the phase
+    Returns:
+        ContextManager[None] - the context manager to time the phase with
+    """
+
+    session: Optional[ProfileSession] = getattr(_local, "session", None)
+
+    if session is None:
+        return _null_phase
+
+    return session.phase(name)
+
+def should_profile() -> bool:
+    """
+    Checks if the current call has asked to be profiled, by environment variable, sampling or admin header
+
+    Parameters:
+        None
+    Returns:
+        bool - True if the call should be profiled, False otherwise
+    """
+
+    if getattr(_local, "session", None) is not None:
+        # Already inside a profiled call
+        return False
+
+    if PROFILE_ALL:
+        return True
+
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return True
+
+    if PROFILE_TOKEN and has_request_context():
+        header: str = request.headers.get(constants.PROFILE_HEADER, "")
+        return hmac.compare_digest(header.encode(), PROFILE_TOKEN.encode())
+
+    return False
+
+def get_collapsed_stacks(profiler: cProfile.Profile) -> list[str]:
+    """
+    Converts a profile into collapsed stacks, the input format for flame graph tools.
+
+    cProfile only records caller and callee pairs, so time is split between the paths
+    into a function in proportion to the time each caller spent in it.
+
+    Parameters:
+        profiler (cProfile.Profile): the finished profiler
+    Returns:
+        list[str] - lines of "frame;frame;frame microseconds"
+    """
+
+    stats: dict = pstats.Stats(profiler).stats
+    callees: dict[tuple, dict[tuple, float]] = {}
+
+    for function, (_, _, _, total_time, callers) in stats.items():
+        for caller, (_, _, _, caller_total_time) in callers.items():
+            if total_time > 0:
+                callees.setdefault(caller, {})[function] = caller_total_time / total_time
+
+    def get_label(function: tuple) -> str:
+        filename, line, name = function
+        return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+    stacks: dict[str, int] = {}
+
+    def walk(function: tuple, path: tuple[str, ...], fraction: float, seen: frozenset) -> None:
+        if len(path) >= constants.PROFILE_MAX_STACK_DEPTH:
+            return
+
+        stack: tuple[str, ...] = path + (get_label(function),)
+        own_time: int = int(stats[function][2] * fraction * 1_000_000)
+
+        if own_time > 0:
+            key: str = ";".join(stack)
+            stacks[key] = stacks.get(key, 0) + own_time
+
+        for callee, share in callees.get(function, {}).items():
+            if callee not in seen and stats[callee][3] * fraction * share * 1_000_000 >= 1:
+                walk(callee, stack, fraction * share, seen | {callee})
+
+    for function, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            walk(function, (), 1.0, frozenset([function]))
+
+    return [f"{stack} {microseconds}" for stack, microseconds in sorted(stacks.items())]
+
+def prune_profiles(directory: str) -> None:
+    """
+    Deletes the oldest profiles so the directory works as a bounded ring
+
+    Parameters:
+        directory (str): the directory the profiles are written to
+    Returns:
+        None
+    """
+
+    def get_modified_time(filename: str) -> float:
+        try:
+            return os.path.getmtime(os.path.join(directory, filename))
+        except FileNotFoundError:
+            # Already pruned by another worker
+            return 0.0
+
+    metadata_files: list[str] = sorted(
+        (filename for filename in os.listdir(directory) if filename.endswith(".json")),
+        key=lambda filename: (get_modified_time(filename), filename)
+    )
+
+    for filename in metadata_files[:-constants.PROFILE_MAX_FILES]:
+        base: str = os.path.join(directory, filename[:-len(".json")])
+
+        for extension in (".json", ".prof", ".folded"):
+            try:
+                os.remove(base + extension)
+            except FileNotFoundError:
+                # Workers share the directory, so another one may have removed it first
+                pass
+
+def write_profile(profiler: cProfile.Profile, name: str, parameters: dict[str, Any], session: ProfileSession, total_time: float) -> str:
+    """
+    Writes a profile as pstats, collapsed stacks and a json file of tags
+
+    Parameters:
+        profiler (cProfile.Profile): the finished profiler
+        name (str): the route or function that was profiled
+        parameters (dict[str, Any]): the parameters of the call
+        session (ProfileSession): the session holding the phase timings
+        total_time (float): the wall clock time of the call in seconds
+    Returns:
+        str - the path of the profile, without an extension
+    """
+
+    os.makedirs(constants.PROFILE_DIRECTORY, exist_ok=True)
+
+    slug: str = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_") or "root"
+    base: str = os.path.join(
+        constants.PROFILE_DIRECTORY,
+        f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(_profile_counter)}-{slug}"
+    )
+
+    profiler.dump_stats(base + ".prof")
+
+    with open(base + ".folded", "w") as f:
+        f.write("\n".join(get_collapsed_stacks(profiler)) + "\n")
+
+    with open(base + ".json", "w") as f:
+        json.dump({
+            "name": name,
+            "parameters": parameters,
+            "total_time": total_time,
+            "phases": session.phases
+        }, f, indent=4, default=str)
+
+    prune_profiles(constants.PROFILE_DIRECTORY)
+
+    return base
+
+def profiled(func: Callable) -> Callable:
+    """
+    Decorator that profiles a call when should_profile says so. When it doesn't, the call runs as normal.
+    If no profiling is configured at import, the function is returned unwrapped, so there is no overhead
+
+    Parameters:
+        func (Callable): the function to profile
+    Returns:
+        Callable - the wrapped function
+    """
+
+    if not (PROFILE_ALL or PROFILE_SAMPLE_RATE > 0 or PROFILE_TOKEN):
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not should_profile() or not _profiler_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+
+        if has_request_context():
+            name: str = request.url_rule.rule if request.url_rule else request.path
+            parameters: dict[str, Any] = dict(request.view_args or {})
+        else:
+            name = func.__qualname__
+            parameters = dict(kwargs)
+
+        session: ProfileSession = ProfileSession()
+        profiler: cProfile.Profile = cProfile.Profile()
+
+        _local.session = session
+        start: float = time.perf_counter()
+
+        try:
+            profiler.enable()
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+        finally:
+            total_time: float = time.perf_counter() - start
+            _local.session = None
+
+            try:
+                base: str = write_profile(profiler, name, parameters, session, total_time)
+                logger.log(__file__, f"Wrote profile for {name} to {base}")
+            except Exception as e:
+                logger.log(__file__, f"Error writing profile for {name}: {e}")
+            finally:
+                _profiler_lock.release()
+
+    return wrapper
@@ -0,0 +1,163 @@
+# Standard Library Imports
+import gzip
+import json
+
+# Standard From Imports
+from typing import Any, Optional
+
+# Third Party From Imports
+from flask import Response, request
+
+# Custom Imports
+import constants
+
+# Custom From Imports
+from models import Library
+
+# Brotli is optional, responses fall back to gzip without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Matches the ascii escaping of flask's default json provider
+_encode_string = json.encoder.encode_basestring_ascii
+_encode_float = float.__repr__
+
+def encode_libraries(libraries: list[Library]) -> str:
+    """
+    Encodes libraries as a json array of objects, in the same shape as the dataclasses
+
+    Parameters:
+        libraries (list[Library]): the libraries to encode
+    Returns:
+        str - the json array
+    """
+
+    return "[" + ",".join(
+        '{"name":' + _encode_string(library.name)
+        + ',"point":{"latitude":' + _encode_float(float(library.point.latitude))
+        + ',"longitude":' + _encode_float(float(library.point.longitude)) + "}}"
+        for library in libraries
+    ) + "]"
+
+def encode_library_columns(libraries: list[Library]) -> str:
+    """
+    Encodes libraries as a json object of columns, which is smaller than an array of objects for large results
+
+    Parameters:
+        libraries (list[Library]): the libraries to encode
+    Returns:
+        str - the json object with name, latitude and longitude arrays
+    """
+
+    return (
+        '{"name":[' + ",".join(_encode_string(library.name) for library in libraries)
+        + '],"latitude":[' + ",".join(_encode_float(float(library.point.latitude)) for library in libraries)
+        + '],"longitude":[' + ",".join(_encode_float(float(library.point.longitude)) for library in libraries)
+        + "]}"
+    )
+
+def encode_response(fields: dict[str, Any], libraries: list[Library], columnar: bool = False) -> str:
+    """
+    Encodes a response body, writing the libraries directly rather than through intermediate dictionaries
+
+    Parameters:
+        fields (dict[str, Any]): the other fields of the response
+        libraries (list[Library]): the libraries to include under "libraries"
+        columnar (bool): whether to encode the libraries as columns
+    Returns:
+        str - the json response body
+    """
+
+    encoded_libraries: str = encode_library_columns(libraries) if columnar else encode_libraries(libraries)
+    encoded_fields: str = json.dumps({**fields, "libraries": None}, separators=(",", ":"))
+
+    # The placeholder is always last, so swap it for the encoded libraries
+    return encoded_fields[:-len("null}")] + encoded_libraries + "}"
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Chooses a content encoding from an Accept-Encoding header, preferring brotli over gzip
+
+    Parameters:
+        accept_encoding (str): the value of the Accept-Encoding header
+    Returns:
+        str | None - "br", "gzip" or None if neither is accepted
+    """
+
+    accepted: dict[str, float] = {}
+
+    for item in accept_encoding.split(","):
+        coding, _, parameters = item.strip().partition(";")
+        quality: float = 1.0
+
+        for parameter in parameters.split(";"):
+            key, _, value = parameter.strip().partition("=")
+
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        accepted[coding.strip().lower()] = quality
+
+    available: list[str] = ["br", "gzip"] if brotli else ["gzip"]
+
+    best: Optional[str] = None
+    best_quality: float = 0.0
+
+    for coding in available:
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+
+        if quality > best_quality:
+            best = coding
+            best_quality = quality
+
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Compresses a response body
+
+    Parameters:
+        body (bytes): the body to compress
+        encoding (str): "br" or "gzip"
+    Returns:
+        bytes - the compressed body
+    """
+
+    if encoding == "br":
+        return brotli.compress(body, quality=constants.BROTLI_QUALITY)
+
+    return gzip.compress(body, compresslevel=constants.GZIP_COMPRESS_LEVEL)
+
+def make_libraries_response(fields: dict[str, Any], libraries: list[Library]) -> Response:
+    """
+    Makes a json response for the current request, using the columnar format if asked for
+    with ?format=columns and compressing it if the client accepts it
+
+    Parameters:
+        fields (dict[str, Any]): the other fields of the response
+        libraries (list[Library]): the libraries to include under "libraries"
+    Returns:
+        Response - the flask response
+    """
+
+    columnar: bool = request.args.get("format") == constants.COLUMNAR_FORMAT
+    body: bytes = encode_response(fields, libraries, columnar).encode()
+
+    response: Response = Response(body, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+
+    if len(body) < constants.COMPRESSION_MIN_SIZE:
+        return response
+
+    encoding: Optional[str] = choose_encoding(request.headers.get("Accept-Encoding", ""))
+
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+
+    return response
@@ -3,17 +3,19 @@ import os
 import sys
 
 # Standard From Library Imports
-from typing import Dict
+from typing import Dict, Optional
 
 # Third Party Imports
 import requests
 
 # Custom Imports
 import constants
+import logger
+import normalisation
 import utilities
 
 # Custom From Imports
-from models import Library, Point
+from models import Library, LibraryRecord, Point
 
 
 def execute_library_sparql_query() -> list[Library]:
@@ -37,44 +39,38 @@ def execute_library_sparql_query() -> list[Library]:
 
     response: requests.Response = requests.get(constants.SPARQL_WIKIDATA_URL, headers=headers, params={"query": sparql_query})
 
-    libraries: list[Library] = []
+    records: list[LibraryRecord] = []
 
     try:
         for result in response.json()["results"]["bindings"]:
+            qid: str = result["item"]["value"].rsplit("/", 1)[-1]
             name: str = result["itemLabel"]["value"]
 
-            add: bool = True
+            has_time_qualifier: bool = "endTime" in result or "startTime" in result
 
-            if "endTime" in result or "startTime" in result:
-                # print the end time value
-                print(name)
-                add = False
+            point: Optional[Point] = None
 
             if "coord" in result:
                 latitude, longitude = map(
                     float, result["coord"]["value"].split("(")[1].split(")")[0].split())
-            else:
-                latitude = -999
-                longitude = -999
-            
-            # Swap latitude and longitude
-            latitude, longitude = longitude, latitude
 
-            if latitude in constants.KNOWN_BAD_LATITUDES:
-                add = False
+                # Swap latitude and longitude
+                latitude, longitude = longitude, latitude
 
-            point: Point = Point(latitude=latitude, longitude=longitude)
-            library: Library = Library(name=name, point=point)
+                point = Point(latitude=latitude, longitude=longitude)
 
-            if add:
-                libraries.append(library)
+            records.append(LibraryRecord(qid=qid, name=name, point=point, has_time_qualifier=has_time_qualifier))
     except:
         print("Error")
         with open("error.txt", "w") as f:
             f.write(response.text)
         print(response.status_code)
         exit()
-    
+
+    libraries, counts = normalisation.normalise_library_records(records)
+
+    logger.log(__file__, f"Normalised {len(records)} wikidata rows into {len(libraries)} libraries: {counts}")
+
     return libraries
 
 def check_postcode_valid(postcode: str) -> bool:
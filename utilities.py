@@ -80,11 +80,12 @@ def distance_between_points(point1: Point, point2: Point) -> float:
         float - the distance between the two points in kilometres
     """
     
-    return acos(
+    # Clamp to acos's domain, as rounding can push identical or opposite points just outside [-1, 1]
+    return acos(max(-1.0, min(1.0,
             sin(radians(point1.latitude)) * sin(radians(point2.latitude)) +
             cos(radians(point1.latitude)) * cos(radians(point2.latitude)) *
             cos(radians(point2.longitude) - radians(point1.longitude))
-        ) * constants.EARTH_RADIUS_KM
+        ))) * constants.EARTH_RADIUS_KM
 
 def is_valid_integer(value: str) -> bool:
     """